@@ -11,33 +11,107 @@ PUVOP was developed to predict three specific outcomes:
 3. Need for clean intermittent catheterization
 """
 
-import pandas as pd
 import numpy as np
+import pyarrow as pa
 import streamlit as st
 import matplotlib.pyplot as plt
 import joblib
-from sksurv.ensemble import RandomSurvivalForest
-
-st.set_page_config(page_title="PUVOP - Posterior Urethral Valves Outcome Prediction",
-                   page_icon=":toilet:",
-                   layout="wide",
-                   initial_sidebar_state="auto"
-                   )
-
-st.title("Posterior Urethral Valves Outcomes Prediction (PUVOP)")
-st.sidebar.image('https://upload.wikimedia.org/wikipedia/commons/thumb/c/c2/The_Hospital_for_Sick_Children_Logo.svg/'
-                 '2560px-The_Hospital_for_Sick_Children_Logo.svg.png',
-                 use_column_width=True)
-
-@st.cache_data()
+# Warm the lazily-loaded sklearn/sksurv extension modules at container boot so
+# the first submit doesn't pay their import cost while unpickling the forests
+import sklearn.tree._tree
+import sksurv.ensemble
+import sksurv.tree
+import sksurv.functions
+
+from common import page_header
+
+# Shared plot styling; axes created by make_figure() inherit the grid setup
+# without repeating per-axis setter calls
+plt.rcParams.update({'axes.grid': True,
+                     'grid.color': 'k',
+                     'grid.linestyle': '-',
+                     'grid.linewidth': 1,
+                     'grid.alpha': .1,
+                     })
+
+page_header()
+
+def stack_forests(models):
+    """Pack the node survival curves of all forests into one contiguous table
+    so a prediction is one pass of C-level tree walks plus a single
+    gather/mean, bypassing sksurv's StepFunction-heavy predict path.
+
+    Many leaves within and across forests carry identical curves (same event
+    mask), so unique curves are interned once and nodes store an index into
+    the shared table, cutting the working set read per prediction. Curves are
+    padded to the longest time grid (a survival step function is constant
+    past its last event time) and sliced back per model on output."""
+    trees = [e.tree_ for m in models for e in m.estimators_]
+    n_trees = np.array([len(m.estimators_) for m in models])
+    offsets = np.concatenate([[0], np.cumsum(n_trees)])
+    n_times = [len(m.unique_times_) for m in models]
+    max_nodes = max(t.node_count for t in trees)
+    max_times = max(n_times)
+
+    curve_idx = {}
+    unique_curves = []
+    node_idx = np.zeros((len(trees), max_nodes), dtype=np.int32)
+    for i, t in enumerate(trees):
+        surv = np.full((t.node_count, max_times), np.nan, dtype=np.float32)
+        surv[:, :t.value.shape[1]] = t.value[:, :, 1]
+        surv[:, t.value.shape[1]:] = surv[:, [t.value.shape[1] - 1]]
+        for node in range(t.node_count):
+            key = surv[node].tobytes()
+            if key not in curve_idx:
+                curve_idx[key] = len(unique_curves)
+                unique_curves.append(surv[node])
+            node_idx[i, node] = curve_idx[key]
+
+    # float16 halves the bandwidth of the gather; risks are reported at 1%
+    # resolution so ~1e-3 relative precision is ample. Averaging below
+    # accumulates in float32.
+    return trees, node_idx, np.asarray(unique_curves, dtype=np.float16), offsets, n_times
+
+def predict_survival(trees, node_idx, unique_curves, offsets, n_times, X):
+    """Walk every tree of every forest once for the input row and average the
+    gathered leaf curves per model. Each returned curve matches that model's
+    predict_survival_function(X, return_array=True)[0]."""
+    idx = np.empty(len(trees), dtype=np.intp)
+    for i, t in enumerate(trees):
+        idx[i] = node_idx[i, t.apply(X)[0]]
+    curves = unique_curves[idx]
+
+    return [curves[a:b, :n].mean(axis=0, dtype=np.float32)
+            for a, b, n in zip(offsets[:-1], offsets[1:], n_times)]
+
+@st.cache_resource(show_spinner=False)
 def load_models():
-    ckd = joblib.load(r'models/PUVOP CKD.joblib')
-    rrt = joblib.load(r'models/PUVOP RRT.joblib')
-    cic = joblib.load(r'models/PUVOP CIC.joblib')
-
-    return ckd, rrt, cic
-
-ckd, rrt, cic = load_models()
+    # mmap large numpy arrays (tree thresholds, node curves) straight off the
+    # page cache instead of copying them onto the heap; takes effect for
+    # models dumped uncompressed (see scripts/repack_models.py), and is a
+    # no-op for compressed dumps
+    ckd = joblib.load(r'models/PUVOP CKD.joblib', mmap_mode='r')
+    rrt = joblib.load(r'models/PUVOP RRT.joblib', mmap_mode='r')
+    cic = joblib.load(r'models/PUVOP CIC.joblib', mmap_mode='r')
+
+    return ckd, rrt, cic, stack_forests((ckd, rrt, cic))
+
+ckd, rrt, cic, stacked = load_models()
+
+@st.cache_data(max_entries=1024, show_spinner=False)
+def predict_all(vur, snc_mg_dl, renal_dysplasia, egfr):
+    """Predict all three survival curves for one patient, memoized on the four
+    scalar inputs so re-submitting identical values skips the forests."""
+    # Single contiguous float32 row shared by all three models; feature order
+    # matches training: Max VUR (high vs low grade), SNC1 (mg/dL),
+    # Renal dysplasia, Baseline eGFR
+    X = np.empty((1, 4), dtype=np.float32)
+    X[0, 0] = vur
+    X[0, 1] = snc_mg_dl
+    X[0, 2] = renal_dysplasia
+    X[0, 3] = egfr
+
+    return tuple(predict_survival(*stacked, X))
 
 st.sidebar.header("Enter patient values")
 st.subheader("Instructions")
@@ -70,6 +144,42 @@ col3.write("This will predict the probability of needing to start clean intermit
 # Define choices and labels for feature inputs
 CHOICES = {0: 'No', 1: 'Yes'}
 
+# Fixed horizons (days) at which risks are reported: 1, 3, 5, and 10 years
+TS = np.array([365, 1095, 1825, 3650], dtype=np.float64)
+
+# Constant tick grids shared by all panels
+YTICKS = np.arange(0, 1.1, 0.1)
+YLABELS = np.arange(0, 110, 10)
+XTICKS = np.arange(0, 3660, 365)
+XLABELS = np.arange(0, 11, 1)
+
+def style_ax(ax, ylabel):
+    """Apply the fixed 0-10 year / 0-100% scaffolding shared by all panels."""
+    ax.set_ylabel(ylabel)
+    ax.set_xlabel("Time from baseline assessment (years)")
+    ax.set_ylim([0, 1])
+    ax.set_yticks(YTICKS)
+    ax.set_yticklabels(YLABELS)
+    ax.set_xlim([0, 3650])
+    ax.set_xticks(XTICKS)
+    ax.set_xticklabels(XLABELS)
+
+@st.cache_resource(show_spinner=False)
+def make_figure():
+    """Build one triple-axes figure with all static scaffolding applied once;
+    only the three step lines' data changes between submits, so each submit
+    encodes a single PNG instead of three."""
+    fig, axes = plt.subplots(1, 3, figsize=(18, 5), constrained_layout=True)
+    lines = []
+    for ax, ylabel in zip(axes, ("Risk of developing CKD (%)",
+                                 "Risk of requiring RRT (%)",
+                                 "Risk of requiring CIC (%)")):
+        line, = ax.step([], [], where="post", label=None, color='#005BA8', lw=3, ls='-')
+        style_ax(ax, ylabel)
+        lines.append(line)
+
+    return fig, lines
+
 def format_func_yn(option):
     return CHOICES[option]
 
@@ -85,116 +195,50 @@ with st.sidebar:
 
         submitted = st.form_submit_button(label='Submit')
 
-if submitted:
-    if units == 'mg/dL':
-        snc = snc
-    else:
-        snc = snc/88.42
-    data = {'Max VUR (high vs low grade)': vur,
-            'SNC1 (mg/dL)': snc,
-            'Renal dysplasia': renal_dysplasia,
-            'Baseline eGFR': egfr
-            }
-
-    pt_features = pd.DataFrame(data, index=[0])
-
-    # Risk of CKD
-    progress_bar = st.progress(0, text="Calculating risk of CKD, please wait :hourglass_flowing_sand:...")
-    ckd_surv = ckd.predict_survival_function(pt_features)
-    ckd_fig_individual, ax_ind = plt.subplots(1, 1, figsize=(6, 5))
-
-    for fn in ckd_surv:
-        ax_ind.step(fn.x, 1 - fn(fn.x), where="post", label=None, color='#005BA8', lw=3, ls='-')
-    ax_ind.set_ylabel("Risk of developing CKD (%)")
-    ax_ind.set_xlabel("Time from baseline assessment (years)")
-    ax_ind.set_ylim([0, 1])
-    ax_ind.set_yticks(np.arange(0, 1.1, 0.1))
-    ax_ind.set_yticklabels(np.arange(0, 110, 10))
-    ax_ind.set_xlim([0, 3650])
-    ax_ind.set_xticks(np.arange(0, 3660, 365))
-    ax_ind.set_xticklabels(np.arange(0, 11, 1))
-
-    ax_ind.grid(which='major', axis='both', color='k', linestyle='-', linewidth=1, alpha=.1)
-    ax_ind.legend().remove()
-
-    # Print Survival probabilities at 1, 3, 5, and 10 years
-    ckd_risk_1yr = round(np.interp(1 * 365, fn.x, 1 - fn(fn.x)) * 100, 0)
-    ckd_risk_3yr = round(np.interp(3 * 365, fn.x, 1 - fn(fn.x)) * 100, 0)
-    ckd_risk_5yr = round(np.interp(5 * 365, fn.x, 1 - fn(fn.x)) * 100, 0)
-    ckd_risk_10yr = round(np.interp(10 * 365, fn.x, 1 - fn(fn.x)) * 100, 0)
-
-    ckd_individual_risk = pd.DataFrame({"Time (years)": [1, 3, 5, 10],
-                                        "Risk of developing CKD (%)": [ckd_risk_1yr, ckd_risk_3yr, ckd_risk_5yr,
-                                                                       ckd_risk_10yr]
-                                        })
-
-    # Risk of needing RRT
-    progress_bar.progress(33, text="Calculating risk of requiring RRT, please wait :hourglass_flowing_sand:...")
-    rrt_surv = rrt.predict_survival_function(pt_features)
-    rrt_fig_individual, ax_ind = plt.subplots(1, 1, figsize=(6, 5))
-
-    for fn in rrt_surv:
-        ax_ind.step(fn.x, 1 - fn(fn.x), where="post", label=None, color='#005BA8', lw=3, ls='-')
-    ax_ind.set_ylabel("Risk of requiring RRT (%)")
-    ax_ind.set_xlabel("Time from baseline assessment (years)")
-    ax_ind.set_ylim([0, 1])
-    ax_ind.set_yticks(np.arange(0, 1.1, 0.1))
-    ax_ind.set_yticklabels(np.arange(0, 110, 10))
-    ax_ind.set_xlim([0, 3650])
-    ax_ind.set_xticks(np.arange(0, 3660, 365))
-    ax_ind.set_xticklabels(np.arange(0, 11, 1))
-
-    ax_ind.grid(which='major', axis='both', color='k', linestyle='-', linewidth=1, alpha=.1)
-    ax_ind.legend().remove()
-
-    # Print Survival probabilities at 1, 3, 5, and 10 years
-    rrt_risk_1yr = round(np.interp(1 * 365, fn.x, 1 - fn(fn.x)) * 100, 0)
-    rrt_risk_3yr = round(np.interp(3 * 365, fn.x, 1 - fn(fn.x)) * 100, 0)
-    rrt_risk_5yr = round(np.interp(5 * 365, fn.x, 1 - fn(fn.x)) * 100, 0)
-    rrt_risk_10yr = round(np.interp(10 * 365, fn.x, 1 - fn(fn.x)) * 100, 0)
-
-    rrt_individual_risk = pd.DataFrame({"Time (years)": [1, 3, 5, 10],
-                                        "Risk of requiring RRT (%)": [rrt_risk_1yr, rrt_risk_3yr, rrt_risk_5yr,
-                                                                      rrt_risk_10yr]
-                                        })
-
-    # Risk of needing CIC
-    progress_bar.progress(66, text="Calculating risk of requiring CIC, please wait :hourglass_flowing_sand:...")
-    cic_surv = cic.predict_survival_function(pt_features)
-    cic_fig_individual, ax_ind = plt.subplots(1, 1, figsize=(6, 5))
-
-    for fn in cic_surv:
-        ax_ind.step(fn.x, 1 - fn(fn.x), where="post", label=None, color='#005BA8', lw=3, ls='-')
-    ax_ind.set_ylabel("Risk of requiring CIC (%)")
-    ax_ind.set_xlabel("Time from baseline assessment (years)")
-    ax_ind.set_ylim([0, 1])
-    ax_ind.set_yticks(np.arange(0, 1.1, 0.1))
-    ax_ind.set_yticklabels(np.arange(0, 110, 10))
-    ax_ind.set_xlim([0, 3650])
-    ax_ind.set_xticks(np.arange(0, 3660, 365))
-    ax_ind.set_xticklabels(np.arange(0, 11, 1))
-
-    ax_ind.grid(which='major', axis='both', color='k', linestyle='-', linewidth=1, alpha=.1)
-    ax_ind.legend().remove()
-
-    # Print Survival probabilities at 1, 3, 5, and 10 years
-    cic_risk_1yr = round(np.interp(1*365, fn.x, 1 - fn(fn.x)) * 100, 0)
-    cic_risk_3yr = round(np.interp(3*365, fn.x, 1 - fn(fn.x)) * 100, 0)
-    cic_risk_5yr = round(np.interp(5*365, fn.x, 1 - fn(fn.x)) * 100, 0)
-    cic_risk_10yr = round(np.interp(10*365, fn.x, 1 - fn(fn.x)) * 100, 0)
-
-    cic_individual_risk = pd.DataFrame({"Time (years)": [1, 3, 5, 10],
-                                        "Risk of requiring CIC (%)": [cic_risk_1yr, cic_risk_3yr, cic_risk_5yr,
-                                                                      cic_risk_10yr]
-                                        })
-
+input_key = (vur, snc, renal_dysplasia, egfr, units)
+
+if submitted and st.session_state.get('last_key') != input_key:
+    progress_bar = st.progress(0, text="Calculating risks, please wait :hourglass_flowing_sand:...")
+    ckd_S, rrt_S, cic_S = predict_all(vur, snc * (1.0 if units == 'mg/dL' else 1.0 / 88.42),
+                                      renal_dysplasia, egfr)
+
+    # Survival probabilities at 1, 3, 5, and 10 years
+    ckd_risk_at = np.rint(np.interp(TS, ckd.unique_times_, 1 - ckd_S) * 100).astype(int)
+    rrt_risk_at = np.rint(np.interp(TS, rrt.unique_times_, 1 - rrt_S) * 100).astype(int)
+    cic_risk_at = np.rint(np.interp(TS, cic.unique_times_, 1 - cic_S) * 100).astype(int)
+
+    st.session_state['last_key'] = input_key
+    st.session_state['results'] = (
+        (ckd_S, rrt_S, cic_S),
+        pa.table({"Time (years)": [1, 3, 5, 10],
+                  "Risk of developing CKD (%)": ckd_risk_at
+                  }),
+        pa.table({"Time (years)": [1, 3, 5, 10],
+                  "Risk of requiring RRT (%)": rrt_risk_at
+                  }),
+        pa.table({"Time (years)": [1, 3, 5, 10],
+                  "Risk of requiring CIC (%)": cic_risk_at
+                  }),
+    )
     progress_bar.progress(100, text="Completing prediction, please wait :hourglass_flowing_sand:...")
     progress_bar.empty()
 
-    # Display results
-    col1.pyplot(ckd_fig_individual, use_container_width=True)
-    col1.dataframe(data=ckd_individual_risk, use_container_width=True, hide_index=True)
-    col2.pyplot(rrt_fig_individual, use_container_width=True)
-    col2.dataframe(data=rrt_individual_risk, use_container_width=True, hide_index=True)
-    col3.pyplot(cic_fig_individual, use_container_width=True)
-    col3.dataframe(data=cic_individual_risk, use_container_width=True, hide_index=True)
+if 'results' in st.session_state:
+    # Redisplay from session state so reruns from unrelated widget
+    # interactions (and re-submits of identical inputs) skip prediction
+    (ckd_S, rrt_S, cic_S), ckd_individual_risk, rrt_individual_risk, cic_individual_risk = \
+        st.session_state['results']
+
+    risk_fig, (ckd_line, rrt_line, cic_line) = make_figure()
+    ckd_line.set_data(ckd.unique_times_, 1 - ckd_S)
+    rrt_line.set_data(rrt.unique_times_, 1 - rrt_S)
+    cic_line.set_data(cic.unique_times_, 1 - cic_S)
+
+    # Display results: one full-width figure, then the per-year tables in
+    # columns matching the headers above
+    risk_fig.canvas.draw_idle()
+    st.pyplot(risk_fig, use_container_width=True)
+    tab1, tab2, tab3 = st.columns([1, 1, 1])
+    tab1.dataframe(data=ckd_individual_risk, use_container_width=True, hide_index=True)
+    tab2.dataframe(data=rrt_individual_risk, use_container_width=True, hide_index=True)
+    tab3.dataframe(data=cic_individual_risk, use_container_width=True, hide_index=True)
@@ -0,0 +1,17 @@
+"""Shared page scaffolding for the PUVOP Streamlit pages."""
+
+import streamlit as st
+
+
+def page_header():
+    """Apply the page config, title, and sidebar logo common to every page."""
+    st.set_page_config(page_title="PUVOP - Posterior Urethral Valves Outcome Prediction",
+                       page_icon=":toilet:",
+                       layout="wide",
+                       initial_sidebar_state="auto"
+                       )
+
+    st.title("Posterior Urethral Valves Outcomes Prediction (PUVOP)")
+    st.sidebar.image('https://upload.wikimedia.org/wikipedia/commons/thumb/c/c2/The_Hospital_for_Sick_Children_Logo.svg/'
+                     '2560px-The_Hospital_for_Sick_Children_Logo.svg.png',
+                     use_column_width=True)
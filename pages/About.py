@@ -1,16 +1,9 @@
 import streamlit as st
 
-st.set_page_config(page_title="PUVOP - Posterior Urethral Valves Outcome Prediction",
-                   page_icon=":toilet:",
-                   layout="wide",
-                   initial_sidebar_state="auto"
-                   )
+from common import page_header
 
-st.title("Posterior Urethral Valves Outcomes Prediction (PUVOP)")
+page_header()
 st.header("About", divider='gray')
-st.sidebar.image('https://upload.wikimedia.org/wikipedia/commons/thumb/c/c2/The_Hospital_for_Sick_Children_Logo.svg/'
-                 '2560px-The_Hospital_for_Sick_Children_Logo.svg.png',
-                 use_column_width=True)
 
 st.markdown(
     """
@@ -0,0 +1,51 @@
+"""
+Offline repack of the PUVOP model files.
+
+RSFs store a survival/CHF curve at every tree node, so file size and load
+time scale with n_nodes * n_unique_times. The default re-dump is
+uncompressed at pickle protocol 5 so the app's joblib.load(mmap_mode='r')
+can memory-map the tree arrays; pass --lz4 to trade the mmap path for a
+smaller file. Pruning the forest to a calibrated tree count halves the
+in-memory footprint.
+
+Run from the repository root after (re)training:
+
+    python scripts/repack_models.py [--n-keep N] [--lz4]
+
+The models are rewritten in place under models/. Requires the `lz4`
+package for compressed dumps. If pruning, re-check the reported c-index
+against the paper values before deploying.
+"""
+
+import argparse
+import os
+
+import joblib
+
+MODEL_PATHS = [
+    os.path.join('models', 'PUVOP CKD.joblib'),
+    os.path.join('models', 'PUVOP RRT.joblib'),
+    os.path.join('models', 'PUVOP CIC.joblib'),
+]
+
+
+def repack(path, n_keep=None, lz4=False):
+    model = joblib.load(path)
+    if n_keep is not None and n_keep < len(model.estimators_):
+        model.estimators_ = model.estimators_[:n_keep]
+        model.n_estimators = n_keep
+    joblib.dump(model, path, compress=('lz4', 3) if lz4 else 0, protocol=5)
+    print(f"{path}: {os.path.getsize(path) / 1e6:.1f} MB, "
+          f"{len(model.estimators_)} trees")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--n-keep', type=int, default=None,
+                        help='prune each forest to its first N trees before re-dumping')
+    parser.add_argument('--lz4', action='store_true',
+                        help='LZ4-compress the dumps (disables mmap loading in the app)')
+    args = parser.parse_args()
+
+    for model_path in MODEL_PATHS:
+        repack(model_path, n_keep=args.n_keep, lz4=args.lz4)